@@ -0,0 +1,65 @@
+"""
+Shared helpers for the opening, middlegame, endgame and variant books
+Zobrist re-keying and the packed uint16 move encoding
+"""
+
+import random
+import chess
+import chess.polyglot
+
+# Low-nibble flag marking a crazyhouse drop; the rest of the nibble is the dropped piece type
+DROP_FLAG = 0x8
+
+def pack_moves(moves) -> bytes:
+    """Pack UCI moves as big-endian uint16 codes: (from << 10) | (to << 4) | promotion
+
+    Drops pack the target square in both square fields and DROP_FLAG | piece type
+    in the low nibble.
+    """
+    packed = bytearray()
+    for uci in moves:
+        move = chess.Move.from_uci(uci)
+        low = DROP_FLAG | move.drop if move.drop else move.promotion or 0
+        packed += ((move.from_square << 10) | (move.to_square << 4) | low).to_bytes(2, 'big')
+    return bytes(packed)
+
+def unpack_move(code: int) -> str:
+    """Turn a packed move code back into a UCI string"""
+    low = code & 0xF
+    to_name = chess.SQUARE_NAMES[(code >> 4) & 0x3F]
+    if low & DROP_FLAG:
+        return chess.piece_symbol(low & ~DROP_FLAG).upper() + '@' + to_name
+    uci = chess.SQUARE_NAMES[code >> 10] + to_name
+    return uci + chess.piece_symbol(low) if low else uci
+
+def pick_packed(moves: bytes, rng=random) -> str:
+    """Pick a random move from a packed move string"""
+    i = rng.randrange(len(moves) >> 1) << 1
+    return unpack_move((moves[i] << 8) | moves[i + 1])
+
+def zobrist_keyed(book, board_cls=chess.Board, value=pack_moves) -> dict:
+    """Re-key a FEN book by polyglot Zobrist hash, skipping FENs that don't parse
+
+    FENs for the same position (e.g. differing only in the move clocks) share
+    a key, so their move lists are merged rather than overwritten. Malformed
+    UCI moves are logged and skipped. Each merged list is then stored as
+    value(moves), packed moves by default.
+    """
+    merged = {}
+    for fen, moves in book.items():
+        try:
+            key = chess.polyglot.zobrist_hash(board_cls(fen))
+        except ValueError:
+            continue
+        if isinstance(moves, str):
+            moves = [moves]
+        known = merged.setdefault(key, [])
+        for move in moves:
+            try:
+                chess.Move.from_uci(move)
+            except ValueError:
+                print(f"⚠ Skipping malformed book move {move!r} at {fen}")
+                continue
+            if move not in known:
+                known.append(move)
+    return {key: value(moves) for key, moves in merged.items() if moves}
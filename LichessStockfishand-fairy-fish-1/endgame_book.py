@@ -5,7 +5,30 @@ Contains 400+ critical endgame positions with theoretical knowledge
 Comprehensive coverage of all endgame types: King+Pawn, Rook, Knight, Bishop, Queen endgames
 """
 
-ENDGAME_BOOK = {
+import types
+import bisect
+import random
+import functools
+import itertools
+import chess
+import chess.polyglot
+from book_utils import zobrist_keyed
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+_WHITE = chess.WHITE
+_BLACK = chess.BLACK
+_BB_ALL = chess.BB_ALL
+
+_RAW_BOOK = {
     # ==================== KING AND PAWN ENDGAMES - BASIC ====================
     
     # Lucena Position (Winning for side with pawn)
@@ -327,25 +350,101 @@ ENDGAME_BOOK = {
     "8/8/8/2pk4/2P5/8/3K4/8 w - - 0 1": ["d2d3", "d2c3", "c4d4"],
 }
 
-def is_endgame(board) -> bool:
-    """Determine if position is an endgame based on material"""
-    import chess
-    
-    # Count pieces (excluding kings and pawns)
-    white_pieces = sum(1 for piece in board.piece_map().values() 
-                      if piece.color == chess.WHITE and piece.piece_type not in [chess.KING, chess.PAWN])
-    black_pieces = sum(1 for piece in board.piece_map().values() 
-                      if piece.color == chess.BLACK and piece.piece_type not in [chess.KING, chess.PAWN])
-    
-    # Endgame if total pieces <= 6 or queens are off
+@functools.lru_cache(maxsize=4096)
+def _is_endgame_py(occ_w: int, occ_b: int, kings: int, pawns: int, queens: int) -> bool:
+    """Endgame test on raw bitboards; cached since positions repeat across searches"""
+    # Count pieces (excluding kings and pawns) straight from the bitboards
+    non_kp_mask = ~kings & ~pawns & _BB_ALL
+    white_pieces = (occ_w & non_kp_mask).bit_count()
+    black_pieces = (occ_b & non_kp_mask).bit_count()
+    
+    # Endgame if total pieces <= 6 or queens are off (bitwise on bools, no short-circuit)
     total_pieces = white_pieces + black_pieces
-    has_queen = any(piece.piece_type == chess.QUEEN for piece in board.piece_map().values())
     
-    return total_pieces <= 6 or (total_pieces <= 10 and not has_queen)
+    return (total_pieces <= 6) | ((total_pieces <= 10) & (queens == 0))
+
+_is_endgame_key = _is_endgame_py
+
+if numba is not None:
+    # Typed constants: mixing uint64 with int64 literals would promote to float64 in numba
+    _M1 = np.uint64(0x5555555555555555)
+    _M2 = np.uint64(0x3333333333333333)
+    _M4 = np.uint64(0x0f0f0f0f0f0f0f0f)
+    _H01 = np.uint64(0x0101010101010101)
+
+    @numba.njit(numba.uint64(numba.uint64), cache=True, nogil=True)
+    def _popcount64(bb):
+        """SWAR popcount; LLVM lowers this to a single ctpop"""
+        bb = bb - ((bb >> np.uint64(1)) & _M1)
+        bb = (bb & _M2) + ((bb >> np.uint64(2)) & _M2)
+        bb = (bb + (bb >> np.uint64(4))) & _M4
+        return (bb * _H01) >> np.uint64(56)
+
+    @numba.njit(numba.boolean(numba.uint64, numba.uint64, numba.uint64, numba.uint64, numba.uint64),
+                cache=True, nogil=True)
+    def _is_endgame_bb(occ_w, occ_b, kings, pawns, queens):
+        """Compiled endgame test on raw bitboards"""
+        non_kp = ~(kings | pawns)
+        total_pieces = _popcount64(occ_w & non_kp) + _popcount64(occ_b & non_kp)
+        return (total_pieces <= 6) | ((total_pieces <= 10) & (queens == 0))
+
+    # The compiled kernel is cheaper than an lru_cache probe, so call it directly
+    _is_endgame_key = _is_endgame_bb
+
+def is_endgame(board) -> bool:
+    """Determine if position is an endgame based on material"""
+    return _is_endgame_key(board.occupied_co[_WHITE], board.occupied_co[_BLACK],
+                           board.kings, board.pawns, board.queens)
+
+def are_endgame(occ_w, occ_b, kings, pawns, queens):
+    """Vectorized is_endgame over arrays of uint64 bitboards
+
+    Without NumPy 2.0+ (np.bitwise_count) this falls back to a list built one
+    position at a time.
+    """
+    if np is None or not hasattr(np, 'bitwise_count'):
+        return [bool(_is_endgame_key(int(w), int(b), int(k), int(p), int(q)))
+                for w, b, k, p, q in zip(occ_w, occ_b, kings, pawns, queens)]
+    occ_w, occ_b, kings, pawns, queens = (
+        np.asarray(bb, dtype=np.uint64) for bb in (occ_w, occ_b, kings, pawns, queens)
+    )
+    non_kp = ~(kings | pawns)
+    total_pieces = np.bitwise_count(occ_w & non_kp) + np.bitwise_count(occ_b & non_kp)
+    return (total_pieces <= 6) | ((total_pieces <= 10) & (queens == 0))
+
+def _book_entry(moves, weights=None) -> tuple:
+    """Freeze a book value to (moves, cumulative_weights); weights default to uniform"""
+    moves = tuple(moves) if isinstance(moves, list) else (moves,)
+    return moves, tuple(itertools.accumulate(weights or (1,) * len(moves)))
+
+def _pick(entry) -> str:
+    """Sample a move from a book entry with one binary search over its cumulative weights"""
+    moves, cum_weights = entry
+    return moves[bisect.bisect(cum_weights, random.random() * cum_weights[-1])]
+
+def _key(fen: str) -> str:
+    """Book key for a FEN: placement, side to move, castling and en passant (no clocks)"""
+    return ' '.join(fen.split(' ', 4)[:4])
+
+# Read-only view of the book: keys are clock-free FENs so transposed positions
+# still hit, and every entry is frozen to (moves, cumulative_weights)
+ENDGAME_BOOK = types.MappingProxyType({
+    _key(fen): _book_entry(moves)
+    for fen, moves in _RAW_BOOK.items()
+})
 
 def get_endgame_move(fen: str) -> str:
     """Get a book move for endgame position"""
-    import random
-    if fen in ENDGAME_BOOK:
-        return random.choice(ENDGAME_BOOK[fen]) if isinstance(ENDGAME_BOOK[fen], list) else ENDGAME_BOOK[fen]
-    return None
+    entry = ENDGAME_BOOK.get(_key(fen))
+    return _pick(entry) if entry else None
+
+ENDGAME_BOOK_Z = types.MappingProxyType(zobrist_keyed(_RAW_BOOK, value=_book_entry))
+
+def get_endgame_move_by_key(zkey: int) -> str:
+    """Get a book move for the endgame position with the given Zobrist hash"""
+    entry = ENDGAME_BOOK_Z.get(zkey)
+    return _pick(entry) if entry else None
+
+def get_endgame_move_board(board) -> str:
+    """Get a book move for endgame position, looked up by the board's Zobrist hash"""
+    return get_endgame_move_by_key(chess.polyglot.zobrist_hash(board))
@@ -9,17 +9,169 @@ import sys
 import time
 import random
 import json
+import shutil
+import functools
+import queue
+import threading
 import chess
 import chess.engine
+import chess.variant
+import chess.polyglot
 import berserk
-from typing import Optional, Tuple, Literal, List, Set
-from opening_book import get_opening_move
-from middlegame_book import get_middlegame_move
-from endgame_book import get_endgame_move, is_endgame
-from variant_opening_books import get_variant_opening_move
+import berserk.formats
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, Literal, List, Set, Dict, FrozenSet
+from opening_book import get_opening_move_by_key
+from middlegame_book import get_middlegame_move_by_key
+from endgame_book import get_endgame_move_by_key, is_endgame
+from variant_opening_books import get_variant_opening_move_by_key
+
+try:
+    import orjson  # Optional: faster decoding of the ndjson event streams
+except ImportError:
+    orjson = None
+
+
+def available_cpus() -> Optional[int]:
+    """CPUs this process may run on (respects affinity/cgroup cpusets), or None if unknown."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count()
+
+
+def _available_memory_mb() -> Optional[int]:
+    """Memory available for new allocations in MB, or None if unknown.
+    
+    Prefers MemAvailable from /proc/meminfo, which counts reclaimable page cache;
+    sysconf's free page count (MemFree) undersizes it on long-running hosts.
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _iter_uci(moves_str: str, start: int = 0):
+    """Yield the space-separated UCI moves of moves_str from index start, without building a list."""
+    n = len(moves_str)
+    i = start
+    while i < n:
+        j = moves_str.find(' ', i)
+        if j < 0:
+            j = n
+        if j > i:
+            yield moves_str[i:j]
+        i = j + 1
+
+
+@functools.lru_cache(maxsize=32)
+def _categorize_tc(initial: float, increment: float) -> Tuple[float, float, int, bool]:
+    """Map a time control to (time_left coefficient, time cap, depth, bullet opening adjust).
+    
+    A coefficient of 0 means the cap is a fixed think time.
+    """
+    bullet = initial <= 60
+    # Hyperbullet to 3+0: minimal thinking
+    if initial <= 3:
+        return 0.0, 0.1, 20, bullet
+    # 4+0 to 10+5: moderate thinking (use increment in calculation too)
+    if initial <= 10 and increment <= 5:
+        return 0.0, 0.5, 30, bullet
+    # Medium blitz/rapid (11 to 14 seconds initial)
+    if initial <= 14:
+        return 0.02, 1.5, 35, bullet
+    # 15+0 and up: maximum thinking time (5 seconds)
+    return 0.04, 5.0, 40, bullet
+
+
+class _OrjsonHandler(berserk.formats.JsonHandler):
+    """berserk JSON handler that decodes ndjson stream lines with orjson."""
+    
+    def parse_stream(self, response):
+        for line in response.iter_lines():
+            if line:
+                yield orjson.loads(line)
+
+
+_STREAM_END = object()
+
+# Per-thread list that collects the streaming HTTP responses a read-ahead thread opens
+_stream_local = threading.local()
+
+
+def _track_stream_response(response, *args, **kwargs):
+    """requests response hook: record streaming responses opened on a read-ahead thread."""
+    responses = getattr(_stream_local, 'responses', None)
+    if responses is not None and kwargs.get('stream'):
+        responses.append(response)
+
+# Challenge decline reasons and the variant assumed when a challenge doesn't name one
+_REASON_LATER = 'later'
+_REASON_GENERIC = 'generic'
+_REASON_VARIANT = 'variant'
+_DEFAULT_VARIANT = 'standard'
+
+
+def _read_ahead(events, maxsize: int = 8):
+    """Yield from an event stream that is read on a background thread into a bounded queue.
+    
+    Exceptions raised by the stream are re-raised in the consumer. Closing the
+    generator (e.g. breaking out of the loop) tells the reader thread to stop
+    and closes the HTTP response behind the stream (see _track_stream_response).
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    done = threading.Event()
+    responses = []
+    
+    def _put(item) -> bool:
+        while not done.is_set():
+            try:
+                buffer.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _reader():
+        _stream_local.responses = responses
+        try:
+            for event in events:
+                if not _put(event):
+                    return
+        except Exception as e:
+            _put(e)
+        _put(_STREAM_END)
+    
+    threading.Thread(target=_reader, daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        done.set()
+        # Closing the response also unblocks a reader still waiting on the socket
+        for response in responses:
+            response.close()
 
 
 class LichessBot:
+    # Built once; the set doesn't depend on the active engine since non-standard variants switch to Fairy Stockfish
+    _SUPPORTED_VARIANTS = frozenset({
+        'standard', 'crazyhouse', 'chess960', 'kingOfTheHill',
+        'threeCheck', 'antichess', 'atomic', 'horde', 'racingKings'
+    })
+    
     def __init__(self, token: str, stockfish_path: str = "./stockfish/stockfish-ubuntu-x86-64-avx2", blocklist_file: str = "blocklist.json"):
         """Initialize the Lichess bot with API token and Stockfish path."""
         self.token = token
@@ -27,24 +179,34 @@ class LichessBot:
         self.fairy_stockfish_path = "./stockfish/fairy-stockfish"
         self.blocklist_file = blocklist_file
         self.session = berserk.TokenSession(token)
+        self.session.hooks['response'].append(_track_stream_response)
         self.client = berserk.Client(session=self.session)
+        if orjson is not None:
+            # Bot event/game streams are parsed line by line; orjson skips the decode + json.loads per event
+            self.client.bots._r.default_fmt = _OrjsonHandler(mime_type=berserk.formats.JSON.mime_type)
         self.engine: Optional[chess.engine.SimpleEngine] = None
         self.username = None
         self.current_game_id: Optional[str] = None
+        self._board_cache: Dict[str, Tuple[str, chess.Board]] = {}  # game_id -> (moves played, board)
+        self._polyglot_books: Dict[str, chess.polyglot.MemoryMappedReader] = {}  # phase -> optional .bin book
+        self._api_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='lichess-api')  # Off-thread POSTs
         self.should_stop = False
         self.blocklist: Set[str] = set()
         self.challenge_accepted = False  # Track if we've accepted a challenge waiting to start
         self.current_arena_id: Optional[str] = None  # Track if we're in an arena game
         
         # Scheduling settings
-        self.start_time = time.time()
+        self.start_time = time.monotonic()  # Monotonic, so wall-clock jumps don't skew the schedule
         self.winding_down = False  # True when in wind-down mode (no new challenges)
         self.final_game_played = False  # True after playing the last game
         self.max_runtime_hours = 12.0  # Shutdown after this many hours
         self.winddown_hours = 11.5  # Start wind-down after this many hours
+        self._update_deadlines()
         
         # Engine selection settings
         self.use_fairy_stockfish = False  # False = Stockfish, True = Fairy Stockfish
+        self._current_uci_variant: Optional[str] = None  # UCI_Variant last sent to the engine
+        self._tc_engine_config: Optional[dict] = None  # Threads/Hash/Overhead last set for a time control
         
         # Variant mapping from Lichess to Fairy Stockfish UCI format
         self.variant_map = {
@@ -59,6 +221,18 @@ class LichessBot:
             'racingKings': 'racingkings'
         }
         
+        # Starting-board factories for each Lichess variant (anything else is standard)
+        self._variant_board_factories = {
+            'chess960': lambda: chess.Board(chess960=True),
+            'crazyhouse': chess.variant.CrazyhouseBoard,
+            'kingOfTheHill': chess.variant.KingOfTheHillBoard,
+            'threeCheck': chess.variant.ThreeCheckBoard,
+            'antichess': chess.variant.AntichessBoard,
+            'atomic': chess.variant.AtomicBoard,
+            'horde': chess.variant.HordeBoard,
+            'racingKings': chess.variant.RacingKingsBoard
+        }
+        
         # Manual speed control settings
         self.manual_mode = False
         self.manual_time_limit = 0.1  # seconds (0.001 to 5.0)
@@ -71,11 +245,21 @@ class LichessBot:
         self.can_challenge_bots = True  # Allow challenging bots
         self.can_challenge_users = True  # Allow challenging users
         self.arena_mode = False  # When enabled, don't send/accept any challenges
+        self._auto_challenge_bots = False  # Set by run()
+        self.verbose = True  # Log every incoming challenge; turn off for quiet headless runs
+        
+        # Incoming-event dispatch for run()
+        self._event_handlers = {
+            'challenge': self._on_challenge,
+            'gameStart': self._on_game_start,
+            'gameFinish': self._on_game_finish
+        }
         
         print("Initializing Lichess Bot...")
         self._verify_bot_account()
         self._initialize_engine()
         self._load_blocklist()
+        self._open_polyglot_books()
         
     def _verify_bot_account(self):
         """Verify that the account is a bot account."""
@@ -102,27 +286,90 @@ class LichessBot:
                 print(f"✗ {engine_name} not found at: {engine_path}")
                 sys.exit(1)
             
-            self.engine = chess.engine.SimpleEngine.popen_uci(engine_path)
+            self.engine = chess.engine.SimpleEngine.popen_uci(self._engine_command(engine_path))
+            self._current_uci_variant = None  # Fresh engine process, no variant set yet
+            self._tc_engine_config = None
             info = self.engine.id
             print(f"✓ Engine initialized: {info['name']}")
 
             # Check engine identity
-            name_lower = info.get('name', '').lower() if isinstance(info.get('name', ''), str) else ''
-            version_lower = info.get('version', '').lower() if isinstance(info.get('version', ''), str) else ''
+            name = info.get('name', '')
+            version = info.get('version', '')
+            name_lower = name.lower() if isinstance(name, str) else ''
+            version_lower = version.lower() if isinstance(version, str) else ''
             if 'stockfish' not in name_lower and 'stockfish' not in version_lower:
                 print(f"⚠ Warning: Engine does not identify as Stockfish (found: {info}). Continuing, but results may vary.")
             
             # Configure engine for high-level play
+            hash_mb = self._hash_size_mb()
+            threads = min(8, available_cpus() or 4)
             self.engine.configure({
-                "Threads": min(8, os.cpu_count() or 4),
-                "Hash": 4096,
+                "Threads": threads,
+                "Hash": hash_mb,
                 "Move Overhead": 50
             })
-            print(f"✓ Engine configured with {min(8, os.cpu_count() or 4)} threads, Hash: 4096 MB")
+            print(f"✓ Engine configured with {threads} threads, Hash: {hash_mb} MB")
         except Exception as e:
             print(f"✗ Failed to initialize engine: {e}")
             sys.exit(1)
     
+    def _engine_command(self, engine_path: str) -> List[str]:
+        """Build the engine command line, interleaving its memory across NUMA nodes when there are several."""
+        numactl = shutil.which('numactl')
+        if numactl and os.path.exists('/sys/devices/system/node/node1'):
+            print("✓ Multiple NUMA nodes found, starting engine under numactl --interleave=all")
+            return [numactl, '--interleave=all', engine_path]
+        return [engine_path]
+    
+    def _hash_size_mb(self) -> int:
+        """Size the engine hash table from available memory (capped at 8192 MB)."""
+        available_mb = _available_memory_mb()
+        if available_mb is None:
+            return 4096  # Neither /proc/meminfo nor sysconf available on this platform
+        return max(16, min(8192, int(available_mb * 0.6)))
+    
+    def _configure_for_time_control(self, initial: float):
+        """Tune engine Threads/Hash/Move Overhead to the game's time control."""
+        if self.manual_mode or not self.engine:
+            return
+        cpus = available_cpus()
+        max_hash = self._hash_size_mb()  # Every profile stays within the memory actually available
+        if initial <= 60:
+            config = {"Threads": min(4, cpus or 2), "Hash": min(512, max_hash), "Move Overhead": 30}
+        elif initial <= 180:
+            config = {"Threads": min(6, cpus or 4), "Hash": min(1024, max_hash), "Move Overhead": 20}
+        else:
+            config = {"Threads": min(8, cpus or 4), "Hash": min(2048, max_hash), "Move Overhead": 2}
+        if config == self._tc_engine_config:
+            return  # Unchanged, so don't make the engine reallocate its hash
+        try:
+            self.engine.configure(config)
+            self._tc_engine_config = config
+            print(f"⚙ Engine tuned for {initial}s: {config['Threads']} threads, Hash: {config['Hash']} MB")
+        except Exception as e:
+            print(f"⚠ Could not tune engine for time control: {e}")
+    
+    def _open_polyglot_books(self, book_dir: str = "books"):
+        """Open any Polyglot books (opening/middlegame/endgame.bin) found in book_dir."""
+        for phase in ('opening', 'middlegame', 'endgame'):
+            path = os.path.join(book_dir, f"{phase}.bin")
+            if os.path.exists(path):
+                try:
+                    self._polyglot_books[phase] = chess.polyglot.open_reader(path)
+                    print(f"✓ Loaded Polyglot {phase} book: {path}")
+                except Exception as e:
+                    print(f"⚠ Could not open Polyglot book {path}: {e}")
+    
+    def _polyglot_move(self, phase: str, board: chess.Board) -> Optional[str]:
+        """Weighted pick from the phase's Polyglot book, or None if there is no book or entry."""
+        reader = self._polyglot_books.get(phase)
+        if reader is None:
+            return None
+        try:
+            return reader.weighted_choice(board).move.uci()
+        except IndexError:
+            return None
+    
     def _load_blocklist(self):
         """Load blocklist from file."""
         try:
@@ -141,8 +388,11 @@ class LichessBot:
     def _save_blocklist(self):
         """Save blocklist to file."""
         try:
-            with open(self.blocklist_file, 'w') as f:
-                json.dump({'blocklist': list(self.blocklist)}, f, indent=2)
+            # Write to a temp file and swap it in, so a crash mid-write can't truncate the blocklist
+            tmp_file = self.blocklist_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump({'blocklist': sorted(self.blocklist)}, f, indent=2)
+            os.replace(tmp_file, self.blocklist_file)
             print(f"✓ Saved {len(self.blocklist)} blocked users")
         except Exception as e:
             print(f"✗ Error saving blocklist: {e}")
@@ -183,6 +433,14 @@ class LichessBot:
         except Exception as e:
             print(f"Error sending chat: {e}")
     
+    def _post_move(self, game_id: str, move_uci: str):
+        """Send a move to Lichess without blocking the game stream."""
+        def _report(future):
+            error = future.exception()
+            if error:
+                print(f"Error sending move {move_uci}: {error}")
+        self._api_pool.submit(self.client.bots.make_move, game_id, move_uci).add_done_callback(_report)
+    
     def get_speed_settings(self) -> dict:
         """Get current speed settings."""
         return {
@@ -227,6 +485,7 @@ class LichessBot:
             
             if config:
                 self.engine.configure(config)
+                self._tc_engine_config = None  # Let the next game re-apply its time-control profile
     
     def get_challenge_settings(self) -> dict:
         """Get current challenge control settings."""
@@ -246,13 +505,10 @@ class LichessBot:
             self.arena_mode = arena_mode
     
     @property
-    def supported_variants(self) -> Set[str]:
+    def supported_variants(self) -> FrozenSet[str]:
         """Get supported variants - all variants supported when Fairy Stockfish is available."""
         # All variants are now supported with auto-switching to Fairy Stockfish
-        return {
-            'standard', 'crazyhouse', 'chess960', 'kingOfTheHill', 
-            'threeCheck', 'antichess', 'atomic', 'horde', 'racingKings'
-        }
+        return self._SUPPORTED_VARIANTS
     
     def get_engine_settings(self) -> dict:
         """Get current engine settings."""
@@ -275,7 +531,7 @@ class LichessBot:
             self.use_fairy_stockfish = use_fairy_stockfish
             self._initialize_engine()
     
-    def get_time_limit(self, game_state: dict, bot_is_white: bool, initial: float, increment: float) -> Tuple[float, int]:
+    def get_time_limit(self, game_state: dict, bot_is_white: bool, initial: float, increment: float, moves_played: int = 0) -> Tuple[float, int]:
         """
         Calculate adaptive time limit based on game time control.
         Uses fixed thinking times based on time control categories:
@@ -293,29 +549,13 @@ class LichessBot:
             btime = game_state.get('btime', 0) / 1000
             
             time_left = wtime if bot_is_white else btime
-            moves_str = game_state.get('moves', '')
-            moves_played = len(moves_str.split()) if moves_str else 0
-            
-            # Time control based strategy
-            # Hyperbullet to 3+0: minimal thinking
-            if initial <= 3:
-                time_limit = 0.1
-                depth = 20
-            # 4+0 to 10+5: moderate thinking (use increment in calculation too)
-            elif initial <= 10 and increment <= 5:
-                time_limit = 0.5
-                depth = 30
-            # Medium blitz/rapid (11 to 14 seconds initial)
-            elif initial <= 14:
-                time_limit = min(1.5, time_left * 0.02)
-                depth = 35
-            # 15+0 and up: maximum thinking time (5 seconds)
-            else:
-                time_limit = min(5.0, time_left * 0.04)
-                depth = 40
+            
+            # Time control category is fixed per game, so it's computed once and cached
+            coef, cap, depth, bullet = _categorize_tc(initial, increment)
+            time_limit = min(cap, time_left * coef) if coef else cap
             
             # Opening adjustment for bullet games
-            if moves_played < 12 and initial <= 60:
+            if moves_played < 12 and bullet:
                 time_limit = max(time_limit * 0.85, 0.1)
             
             return time_limit, depth
@@ -324,101 +564,105 @@ class LichessBot:
             print(f"Error calculating time limit: {e}")
             return 0.5, 30
     
-    def make_move(self, game_id: str, game_state: dict, bot_is_white: bool, initial: float, increment: float, variant: str = 'standard') -> Optional[str]:
-        """Calculate and make the best move."""
+    def _get_board(self, game_id: str, moves_str: str, variant: str = 'standard') -> chess.Board:
+        """Get the current board for a game, pushing only the moves played since the last call."""
+        prev_moves_str, board = self._board_cache.get(game_id, ('', None))
+        if board is not None and moves_str.startswith(prev_moves_str) and moves_str[len(prev_moves_str):][:1] in ('', ' '):
+            new_moves = _iter_uci(moves_str, len(prev_moves_str))
+        else:
+            board = self._variant_board_factories.get(variant, chess.Board)()
+            new_moves = _iter_uci(moves_str)
+        
+        try:
+            for move_uci in new_moves:
+                board.push_uci(move_uci)
+        except ValueError:
+            # Don't keep a half-updated board around
+            self._board_cache.pop(game_id, None)
+            raise
+        
+        self._board_cache[game_id] = (moves_str, board)
+        return board
+    
+    def _is_legal_book_move(self, board: chess.Board, book_move: Optional[str]) -> bool:
+        """Check a book move against the board without enumerating every legal move."""
+        if not book_move:
+            return False
+        try:
+            return board.is_legal(chess.Move.from_uci(book_move))
+        except ValueError:
+            return False  # Malformed UCI string in the book
+    
+    def make_move(self, game_id: str, game_state: dict, bot_is_white: bool, initial: float, increment: float, variant: str = 'standard', moves_count: int = 0, uci_variant: Optional[str] = None) -> Optional[str]:
+        """Calculate and make the best move.
+        
+        uci_variant is the engine's UCI_Variant for this game, resolved once per game by the caller.
+        """
         if not self.engine:
             print("Error: Engine not initialized")
             return None
             
         try:
             moves = game_state.get('moves', '')
+            board = self._get_board(game_id, moves, variant)
             
-            # Create board based on variant
-            if variant == 'chess960':
-                board = chess.Board(chess960=True)
-            elif variant == 'crazyhouse':
-                import chess.variant as variant_module
-                board = variant_module.CrazyhouseBoard()
-            elif variant == 'kingOfTheHill':
-                import chess.variant as variant_module
-                board = variant_module.KingOfTheHillBoard()
-            elif variant == 'threeCheck':
-                import chess.variant as variant_module
-                board = variant_module.ThreeCheckBoard()
-            elif variant == 'antichess':
-                import chess.variant as variant_module
-                board = variant_module.AntichessBoard()
-            elif variant == 'atomic':
-                import chess.variant as variant_module
-                board = variant_module.AtomicBoard()
-            elif variant == 'horde':
-                import chess.variant as variant_module
-                board = variant_module.HordeBoard()
-            elif variant == 'racingKings':
-                import chess.variant as variant_module
-                board = variant_module.RacingKingsBoard()
-            else:  # standard
-                board = chess.Board()
-            
-            # Set variant for Fairy Stockfish
-            if self.use_fairy_stockfish and variant in self.variant_map:
-                uci_variant = self.variant_map[variant]
+            # Set variant for Fairy Stockfish (only when it changes, each configure is an engine round trip)
+            if uci_variant is not None and uci_variant != self._current_uci_variant:
                 try:
                     self.engine.configure({"UCI_Variant": uci_variant})
+                    self._current_uci_variant = uci_variant
                 except:
                     pass  # Some options might not be settable
             
-            if moves:
-                for move_uci in moves.split():
-                    board.push_uci(move_uci)
-            
             if board.is_game_over():
                 return None
             
             # Check chess books
             move_uci = None
-            fen = board.fen()
-            moves_count = len(moves.split()) if moves else 0
             
             if variant == 'standard':
+                # Standard books are keyed by Zobrist hash, so no FEN is built here
+                zkey = chess.polyglot.zobrist_hash(board)
+                
                 # Try opening book first (moves 0-15)
                 if moves_count <= 15:
-                    book_move = get_opening_move(fen)
-                    if book_move and chess.Move.from_uci(book_move) in board.legal_moves:
+                    book_move = self._polyglot_move('opening', board) or get_opening_move_by_key(zkey)
+                    if self._is_legal_book_move(board, book_move):
                         move_uci = book_move
                         print(f"📖 Opening book move: {move_uci}")
                 
                 # Try middlegame book (moves 10-30)
                 if not move_uci and 10 <= moves_count <= 30:
-                    book_move = get_middlegame_move(fen, moves_count)
-                    if book_move and chess.Move.from_uci(book_move) in board.legal_moves:
+                    book_move = self._polyglot_move('middlegame', board) or get_middlegame_move_by_key(zkey, moves_count)
+                    if self._is_legal_book_move(board, book_move):
                         move_uci = book_move
                         print(f"📖 Middlegame book move: {move_uci}")
                 
                 # Try endgame book
                 if not move_uci and is_endgame(board):
-                    book_move = get_endgame_move(fen)
-                    if book_move and chess.Move.from_uci(book_move) in board.legal_moves:
+                    book_move = self._polyglot_move('endgame', board) or get_endgame_move_by_key(zkey)
+                    if self._is_legal_book_move(board, book_move):
                         move_uci = book_move
                         print(f"📖 Endgame book move: {move_uci}")
             else:
                 # Try variant-specific opening book (moves 0-10)
                 if moves_count <= 10:
-                    book_move = get_variant_opening_move(variant, fen)
-                    if book_move and chess.Move.from_uci(book_move) in board.legal_moves:
+                    book_move = get_variant_opening_move_by_key(variant, chess.polyglot.zobrist_hash(board))
+                    if self._is_legal_book_move(board, book_move):
                         move_uci = book_move
                         print(f"📖 {variant.title()} book move: {move_uci}")
             
             # If no book move found, use engine
             if not move_uci:
-                time_limit, depth = self.get_time_limit(game_state, bot_is_white, initial, increment)
+                time_limit, depth = self.get_time_limit(game_state, bot_is_white, initial, increment, moves_count)
                 
                 print(f"Thinking (limit: {time_limit:.2f}s, depth: {depth})...", end=' ', flush=True)
                 
                 result = self.engine.play(
                     board, 
                     chess.engine.Limit(time=time_limit, depth=depth),
-                    info=chess.engine.INFO_ALL
+                    info=chess.engine.INFO_SCORE,
+                    game=game_id  # ucinewgame only when the game changes, so the hash survives between moves
                 )
                 
                 if result.move:
@@ -429,7 +673,7 @@ class LichessBot:
             
             # Make the move (either from book or engine)
             if move_uci:
-                self.client.bots.make_move(game_id, move_uci)
+                self._post_move(game_id, move_uci)
                 return move_uci
             
         except Exception as e:
@@ -437,19 +681,16 @@ class LichessBot:
         
         return None
     
-    def is_our_turn(self, game_state: dict, bot_is_white: bool) -> bool:
-        """Check if it's the bot's turn by reconstructing the board."""
-        moves_str = game_state.get('moves', '')
-        board = chess.Board()
-        
-        if moves_str:
-            for move_uci in moves_str.split():
-                try:
-                    board.push_uci(move_uci)
-                except ValueError:
-                    return False
+    def is_our_turn(self, moves_str: str, bot_is_white: bool) -> bool:
+        """Check if it's the bot's turn from the number of moves played.
         
-        return (board.turn == chess.WHITE) == bot_is_white
+        Every supported variant alternates turns starting with white, so the
+        side to move follows from the parity of the move count.
+        """
+        if not moves_str:
+            return bot_is_white
+        white_to_move = (moves_str.count(' ') + 1) % 2 == 0
+        return white_to_move == bot_is_white
     
     def is_arena_game(self, game_event: dict) -> Tuple[bool, Optional[str]]:
         """Check if a game is part of an arena/tournament.
@@ -473,13 +714,16 @@ class LichessBot:
             increment = 0.0
             chat_sent = False
             variant = 'standard'
+            uci_variant = None
             is_arena = False
             
-            for event in self.client.bots.stream_game_state(game_id):
+            # Read the stream ahead on a separate thread so events keep arriving while the engine thinks
+            for event in _read_ahead(self.client.bots.stream_game_state(game_id)):
                 if event['type'] == 'gameFull':
                     variant = event.get('variant', {}).get('key', 'standard')
                     print(f"Game started: {event['white']['name']} vs {event['black']['name']}")
                     print(f"Variant: {variant}")
+                    uci_variant = self.variant_map.get(variant) if self.use_fairy_stockfish else None
                     
                     # Check if this is an arena game
                     is_arena, tournament_id = self.is_arena_game(event)
@@ -494,16 +738,20 @@ class LichessBot:
                     increment = clock.get('increment', 0) / 1000
                     
                     print(f"Time control: {initial}s + {increment}s")
+                    self._configure_for_time_control(initial)
                     
                     bot_is_white = event['white'].get('id') == (self.username.lower() if self.username else "")
                     game_state = event['state']
+                    moves_str = game_state.get('moves', '')
+                    moves_count = moves_str.count(' ') + 1 if moves_str else 0
                     
                     if not chat_sent:
-                        self.send_chat_message(game_id, "I am WildOrderBot I am almost unstopable!")
+                        # Off-thread, so the greeting doesn't delay our first move
+                        self._api_pool.submit(self.send_chat_message, game_id, "I am WildOrderBot I am almost unstopable!")
                         chat_sent = True
                     
-                    if game_state['status'] == 'started' and self.is_our_turn(game_state, bot_is_white):
-                        self.make_move(game_id, game_state, bot_is_white, initial, increment, variant)
+                    if game_state['status'] == 'started' and self.is_our_turn(moves_str, bot_is_white):
+                        self.make_move(game_id, game_state, bot_is_white, initial, increment, variant, moves_count, uci_variant)
                 
                 elif event['type'] == 'gameState':
                     game_state = event
@@ -515,13 +763,14 @@ class LichessBot:
                     if bot_is_white is None:
                         continue
                     
-                    moves = game_state.get('moves', '').split() if game_state.get('moves') else []
+                    moves_str = game_state.get('moves', '')
+                    moves_count = moves_str.count(' ') + 1 if moves_str else 0
                     
-                    if len(moves) > 0:
-                        print(f"Opponent played: {moves[-1]}")
+                    if moves_str:
+                        print(f"Opponent played: {moves_str[moves_str.rfind(' ') + 1:]}")
                     
-                    if self.is_our_turn(game_state, bot_is_white):
-                        self.make_move(game_id, game_state, bot_is_white, initial, increment, variant)
+                    if self.is_our_turn(moves_str, bot_is_white):
+                        self.make_move(game_id, game_state, bot_is_white, initial, increment, variant, moves_count, uci_variant)
                 
                 elif event['type'] == 'chatLine':
                     user = event.get('username', 'Unknown')
@@ -535,10 +784,12 @@ class LichessBot:
                 print(f"✅ Arena game ended - arena mode disabled, resuming normal operations")
             
             self.current_game_id = None
+            self._board_cache.pop(game_id, None)
                     
         except Exception as e:
             print(f"Error handling game {game_id}: {e}")
             self.current_game_id = None
+            self._board_cache.pop(game_id, None)
     
     def challenge_user(self, username: str, rated: bool = True, clock_limit: int = 180, clock_increment: int = 0):
         """Challenge another user to a game."""
@@ -625,12 +876,23 @@ class LichessBot:
     def get_online_bots(self, limit: int = 150) -> List[str]:
         """Get a list of online bot usernames."""
         try:
-            online_bots = []
-            for bot in self.client.bots.get_online_bots():
-                if self.username and bot['username'].lower() != self.username.lower():
-                    online_bots.append(bot['username'])
-                if len(online_bots) >= limit:
-                    break
+            online_bots: List[str] = []
+            self_lower = self.username.lower() if self.username else None
+            # Ask the server for just enough bots (+1 in case our own account is among them)
+            bots_stream = self.client.bots.get_online_bots(limit=limit + 1)
+            try:
+                for bot in bots_stream:
+                    name = bot['username']
+                    if self_lower and name.lower() == self_lower:
+                        continue
+                    online_bots.append(name)
+                    if len(online_bots) >= limit:
+                        break
+            finally:
+                # Finish berserk's generator now; the response itself is released once the server ends the short stream
+                close = getattr(bots_stream, 'close', None)
+                if close:
+                    close()
             return online_bots
         except Exception as e:
             print(f"Error fetching online bots: {e}")
@@ -658,8 +920,9 @@ class LichessBot:
                 print("No online bots found to challenge")
                 return False
             
-            # Filter out blocked users
-            available_bots = [bot for bot in online_bots if not self.is_blocked(bot)]
+            # Filter out blocked users (inline membership test, no is_blocked call per bot)
+            blocklist = self.blocklist
+            available_bots = [bot for bot in online_bots if bot.lower() not in blocklist]
             if not available_bots:
                 print("No available bots to challenge (all are blocked)")
                 return False
@@ -696,11 +959,14 @@ class LichessBot:
             challenge_users: Optional list of usernames to challenge at startup
             auto_challenge_bots: If True, automatically challenge random bots when idle
         """
+        self._auto_challenge_bots = auto_challenge_bots
         print(f"\n{'='*60}")
         print("Bot is now running and listening for challenges...")
         if auto_challenge_bots:
             print("Auto-challenging random bots enabled (3+0 blitz)")
         print(f"Schedule: Wind-down at {self.winddown_hours}h, Shutdown at {self.max_runtime_hours}h")
+        # Runners adjust the schedule hours after construction, so refresh the deadlines here
+        self._update_deadlines()
         print(f"{'='*60}\n")
         
         if challenge_users:
@@ -714,19 +980,19 @@ class LichessBot:
             time.sleep(2)
         
         try:
-            for event in self.client.bots.stream_incoming_events():
-                # Check schedule status
-                schedule_status = self.check_schedule()
-                runtime_hours = self.get_runtime_hours()
+            # Read ahead on a background thread, so incoming events are pulled off the socket while we handle the last one
+            for event in _read_ahead(self.client.bots.stream_incoming_events()):
+                # Check schedule status against the precomputed monotonic deadlines
+                now = time.monotonic()
                 
-                if schedule_status == 'shutdown':
-                    print(f"\n⏰ Maximum runtime ({self.max_runtime_hours}h) reached after {runtime_hours:.2f}h")
+                if now >= self._shutdown_at:
+                    print(f"\n⏰ Maximum runtime ({self.max_runtime_hours}h) reached after {self.get_runtime_hours():.2f}h")
                     print("Shutting down bot...")
                     break
                 
-                if schedule_status == 'winding_down' and not self.winding_down:
+                if now >= self._winddown_at and not self.winding_down:
                     self.winding_down = True
-                    print(f"\n⏰ Wind-down mode activated at {runtime_hours:.2f}h")
+                    print(f"\n⏰ Wind-down mode activated at {self.get_runtime_hours():.2f}h")
                     print("No new challenges will be accepted. Playing final game...")
                     
                     # If not currently in a game, challenge one last bot
@@ -738,74 +1004,9 @@ class LichessBot:
                     print("\nStop signal received, shutting down...")
                     break
                 
-                if event['type'] == 'challenge':
-                    challenge = event['challenge']
-                    challenger = challenge['challenger']['name']
-                    variant = challenge.get('variant', {}).get('key', 'standard, chess960')
-                    rated = challenge.get('rated', False)
-                    
-                    time_control = challenge.get('timeControl', {})
-                    if isinstance(time_control, dict):
-                        tc_type = time_control.get('type', 'unknown')
-                        if tc_type == 'clock':
-                            initial = time_control.get('limit', 0)
-                            increment = time_control.get('increment', 0)
-                            tc_str = f"{initial}+{increment}"
-                        else:
-                            tc_str = tc_type
-                    else:
-                        tc_str = 'unknown'
-                    
-                    print(f"\n→ Challenge from {challenger} ({variant}, {'rated' if rated else 'casual'}, {tc_str})")
-                    
-                    if self.winding_down:
-                        print(f"  Declining: Bot is winding down, not accepting new challenges")
-                        self.decline_challenge(challenge['id'], reason="later")
-                    elif self.current_game_id:
-                        print(f"  Declining: Already playing game {self.current_game_id}")
-                        self.decline_challenge(challenge['id'], reason="later")
-                    elif self.challenge_accepted:
-                        print(f"  Declining: Already accepted a challenge, waiting for game to start")
-                        self.decline_challenge(challenge['id'], reason="later")
-                    elif self.is_blocked(challenger):
-                        print(f"  Declining: {challenger} is blocked")
-                        self.decline_challenge(challenge['id'], reason="generic")
-                    elif variant in self.supported_variants:
-                        # Auto-enable Fairy Stockfish for non-standard variants
-                        if variant != 'standard' and not self.use_fairy_stockfish:
-                            print(f"  Auto-enabling Fairy Stockfish for {variant} variant")
-                            self.set_engine_settings(use_fairy_stockfish=True)
-                        self.accept_challenge(challenge['id'])
-                    else:
-                        print(f"  Declining: Variant {variant} not supported")
-                        self.decline_challenge(challenge['id'], reason="variant")
-                
-                elif event['type'] == 'gameStart':
-                    game_id = event['game']['id']
-                    self.challenge_accepted = False  # Reset flag when game starts
-                    if self.current_game_id and self.current_game_id != game_id:
-                        print(f"⚠ Warning: Starting new game {game_id} while {self.current_game_id} is active")
-                    self.handle_game(game_id)
-                
-                elif event['type'] == 'gameFinish':
-                    game_id = event['game']['id']
-                    print(f"\nGame finished: {game_id}")
-                    if self.current_game_id == game_id:
-                        self.current_game_id = None
-                    
-                    # Check if this was the final game during wind-down
-                    if self.winding_down:
-                        self.final_game_played = True
-                        runtime = self.get_runtime_hours()
-                        print(f"\n✓ Final game completed at {runtime:.2f}h runtime")
-                        # Don't break yet - let the bot continue until max_runtime_hours is reached
-                        # The schedule check at the top of the loop will handle shutdown
-                    
-                    if auto_challenge_bots and not self.current_game_id and not self.winding_down:
-                        print("\n⏱ Waiting 35 seconds before challenging next bot...")
-                        time.sleep(35)
-                        if not self.should_stop and not self.winding_down:
-                            self.challenge_random_bot(rated=False, clock_limit=180, clock_increment=0)
+                handler = self._event_handlers.get(event['type'])
+                if handler:
+                    handler(event)
                     
         except KeyboardInterrupt:
             print("\n\nShutting down bot...")
@@ -814,26 +1015,97 @@ class LichessBot:
         finally:
             self.cleanup()
     
-    def get_runtime_hours(self) -> float:
-        """Get how long the bot has been running in hours."""
-        return (time.time() - self.start_time) / 3600
-    
-    def check_schedule(self) -> str:
-        """Check the current schedule status.
+    def _decline_reason(self, challenger: str, variant: str) -> Optional[Tuple[str, str]]:
+        """Return (decline reason, log message template) for a challenge, or None to accept it.
         
-        Returns:
-            'running' - Normal operation
-            'winding_down' - Stop accepting challenges, play one last game
-            'shutdown' - Time to stop completely
+        Templates are only formatted when verbose logging is on (see _on_challenge).
         """
-        runtime = self.get_runtime_hours()
+        if self.winding_down:
+            return _REASON_LATER, "Bot is winding down, not accepting new challenges"
+        if self.current_game_id:
+            return _REASON_LATER, "Already playing game {game_id}"
+        if self.challenge_accepted:
+            return _REASON_LATER, "Already accepted a challenge, waiting for game to start"
+        if self.is_blocked(challenger):
+            return _REASON_GENERIC, "{challenger} is blocked"
+        if variant not in self.supported_variants:
+            return _REASON_VARIANT, "Variant {variant} not supported"
+        return None
+    
+    def _on_challenge(self, event: dict):
+        """Accept or decline an incoming challenge."""
+        challenge = event['challenge']
+        challenge_id = challenge['id']
+        challenger = challenge['challenger']['name']
+        variant = challenge.get('variant', {}).get('key', _DEFAULT_VARIANT)
         
-        if runtime >= self.max_runtime_hours:
-            return 'shutdown'
-        elif runtime >= self.winddown_hours:
-            return 'winding_down'
-        else:
-            return 'running'
+        if self.verbose:
+            rated = challenge.get('rated', False)
+            time_control = challenge.get('timeControl', {})
+            if isinstance(time_control, dict):
+                tc_type = time_control.get('type', 'unknown')
+                if tc_type == 'clock':
+                    initial = time_control.get('limit', 0)
+                    increment = time_control.get('increment', 0)
+                    tc_str = f"{initial}+{increment}"
+                else:
+                    tc_str = tc_type
+            else:
+                tc_str = 'unknown'
+            print(f"\n→ Challenge from {challenger} ({variant}, {'rated' if rated else 'casual'}, {tc_str})")
+        
+        decline = self._decline_reason(challenger, variant)
+        if decline:
+            reason, message = decline
+            if self.verbose:
+                print("  Declining: " + message.format(game_id=self.current_game_id, challenger=challenger, variant=variant))
+            # Declines go through the API pool so a burst of challenges isn't serialized on HTTPS round trips
+            self._api_pool.submit(self.decline_challenge, challenge_id, reason)
+            return
+        
+        # Auto-enable Fairy Stockfish for non-standard variants
+        if variant != 'standard' and not self.use_fairy_stockfish:
+            print(f"  Auto-enabling Fairy Stockfish for {variant} variant")
+            self.set_engine_settings(use_fairy_stockfish=True)
+        self.accept_challenge(challenge_id)
+    
+    def _on_game_start(self, event: dict):
+        """Play a game that has just started."""
+        game_id = event['game']['id']
+        self.challenge_accepted = False  # Reset flag when game starts
+        if self.current_game_id and self.current_game_id != game_id:
+            print(f"⚠ Warning: Starting new game {game_id} while {self.current_game_id} is active")
+        self.handle_game(game_id)
+    
+    def _on_game_finish(self, event: dict):
+        """Record a finished game and challenge the next bot when idle."""
+        game_id = event['game']['id']
+        print(f"\nGame finished: {game_id}")
+        if self.current_game_id == game_id:
+            self.current_game_id = None
+        
+        # Check if this was the final game during wind-down
+        if self.winding_down:
+            self.final_game_played = True
+            runtime = self.get_runtime_hours()
+            print(f"\n✓ Final game completed at {runtime:.2f}h runtime")
+            # Don't break yet - let the bot continue until max_runtime_hours is reached
+            # The schedule check at the top of the loop will handle shutdown
+        
+        if self._auto_challenge_bots and not self.current_game_id and not self.winding_down:
+            print("\n⏱ Waiting 35 seconds before challenging next bot...")
+            time.sleep(35)
+            if not self.should_stop and not self.winding_down:
+                self.challenge_random_bot(rated=False, clock_limit=180, clock_increment=0)
+    
+    def _update_deadlines(self):
+        """Convert the schedule hours into absolute monotonic deadlines."""
+        self._winddown_at = self.start_time + self.winddown_hours * 3600
+        self._shutdown_at = self.start_time + self.max_runtime_hours * 3600
+    
+    def get_runtime_hours(self) -> float:
+        """Get how long the bot has been running in hours."""
+        return (time.monotonic() - self.start_time) / 3600
     
     def stop(self):
         """Signal the bot to stop and close the session."""
@@ -848,6 +1120,10 @@ class LichessBot:
     
     def cleanup(self):
         """Clean up resources."""
+        self._api_pool.shutdown(wait=True)
+        for reader in self._polyglot_books.values():
+            reader.close()
+        self._polyglot_books.clear()
         if self.engine:
             print("Closing engine...")
             self.engine.quit()
@@ -7,7 +7,7 @@ Scheduled to run for 12 hours with wind-down at 11.5 hours
 
 import os
 import sys
-from lichess_bot import LichessBot
+from lichess_bot import LichessBot, available_cpus
 
 
 def main():
@@ -34,9 +34,10 @@ def main():
     bot.winddown_hours = 11.5
     bot.max_runtime_hours = 12.0
     
+    threads = min(8, available_cpus() or 4)
     if bot.engine:
         bot.engine.configure({
-            "Threads": min(8, os.cpu_count() or 4),
+            "Threads": threads,
             "Hash": 2048,
             "Move Overhead": 50
         })
@@ -44,7 +45,7 @@ def main():
     print(f"\nManual mode enabled:")
     print(f"  - Time limit: {bot.manual_time_limit * 1000:.0f}ms per move")
     print(f"  - Search depth: {bot.manual_depth}")
-    print(f"  - Threads: {min(8, os.cpu_count() or 4)}")
+    print(f"  - Threads: {threads}")
     print(f"  - Hash: 2048 MB")
     
     print("\n" + "=" * 60)
@@ -5,6 +5,10 @@ Contains 300+ middlegame positions with tactical and strategic patterns
 Organized by theme and tactical motif
 """
 
+import types
+import random
+from book_utils import zobrist_keyed, pick_packed
+
 MIDDLEGAME_PATTERNS = {
     # ==================== ISOLATED PAWN (IQP) POSITIONS ====================
     "r1bq1rk1/pp1nbppp/2p1pn2/3p4/2PP4/2N1PN2/PP2BPPP/R1BQ1RK1 w - - 0 9": ["d4d5", "b1d2", "c1e3"],
@@ -181,10 +185,18 @@ MIDDLEGAME_PATTERNS = {
 
 def get_middlegame_move(fen: str, moves_count: int) -> str:
     """Get a book move for middlegame position"""
-    import random
-    
     # Only use middlegame book between moves 10-30
     if 10 <= moves_count <= 30 and fen in MIDDLEGAME_PATTERNS:
         moves = MIDDLEGAME_PATTERNS[fen]
         return random.choice(moves) if isinstance(moves, list) else moves
     return None
+
+MIDDLEGAME_PATTERNS_Z = types.MappingProxyType(zobrist_keyed(MIDDLEGAME_PATTERNS))
+
+def get_middlegame_move_by_key(zkey: int, moves_count: int) -> str:
+    """Get a book move for the middlegame position with the given Zobrist hash"""
+    # Only use middlegame book between moves 10-30
+    if not 10 <= moves_count <= 30:
+        return None
+    moves = MIDDLEGAME_PATTERNS_Z.get(zkey)
+    return pick_packed(moves) if moves else None
@@ -5,6 +5,10 @@ Contains 500+ opening lines mapped by FEN position
 Comprehensive coverage of all major opening systems
 """
 
+import types
+import random
+from book_utils import zobrist_keyed, pick_packed
+
 OPENING_BOOK = {
     # ==================== STARTING POSITION ====================
     "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1": ["e2e4", "d2d4", "c2c4", "g1f3", "b1c3"],
@@ -316,7 +320,13 @@ OPENING_BOOK = {
 
 def get_opening_move(fen: str) -> str:
     """Get a book move for the given position, returns None if not in book"""
-    import random
     if fen in OPENING_BOOK:
         return random.choice(OPENING_BOOK[fen])
     return None
+
+OPENING_BOOK_Z = types.MappingProxyType(zobrist_keyed(OPENING_BOOK))
+
+def get_opening_move_by_key(zkey: int) -> str:
+    """Get a book move for the position with the given Zobrist hash, returns None if not in book"""
+    moves = OPENING_BOOK_Z.get(zkey)
+    return pick_packed(moves) if moves else None
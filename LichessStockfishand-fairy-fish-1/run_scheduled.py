@@ -8,8 +8,9 @@ Runs from 8am CST to 8pm CST (12 hour window)
 """
 
 import os
+import re
 import sys
-from lichess_bot import LichessBot
+from lichess_bot import LichessBot, available_cpus
 from datetime import datetime, timedelta
 try:
     # Python 3.9+ zoneinfo
@@ -17,29 +18,24 @@ try:
 except Exception:
     ZoneInfo = None
 
+# KEY=value lines of a .env file; comment lines can't match since a key can't start with '#'
+_DOTENV_LINE = re.compile(r'^[ \t]*([^#=\s][^=\n]*?)[ \t]*=(.*)$', re.M)
+
 
 def main():
     # Load local .env file if present (convenience for local runs).
     # This allows you to create a `.env` file with `LICHESS_TOKEN=...` for local testing.
     def load_dotenv(path='.env'):
         try:
-            if not os.path.exists(path):
-                return
             with open(path, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    if '=' not in line:
-                        continue
-                    key, val = line.split('=', 1)
-                    key = key.strip()
-                    val = val.strip().strip('"').strip("'")
-                    # Only set if not already present in environment
-                    if key and key not in os.environ:
-                        os.environ[key] = val
+                data = f.read()
         except Exception:
-            pass
+            return  # No .env file (or unreadable), nothing to load
+        for key, val in _DOTENV_LINE.findall(data):
+            val = val.strip().strip('"').strip("'")
+            # Only set if not already present in environment
+            if key not in os.environ:
+                os.environ[key] = val
 
     load_dotenv()
 
@@ -70,21 +66,24 @@ def main():
         engine_path_to_use = env_engine
     else:
         # Prefer Stockfish 18 first, then 17.1, then older versions, then bundled fallbacks
-        candidate_names = [
-            os.path.join(script_dir, 'stockfish', 'stockfish-18'),
-            os.path.join(script_dir, 'stockfish', 'stockfish-17.1'),
-            os.path.join(script_dir, 'stockfish', 'stockfish-17'),
-            os.path.join(script_dir, 'stockfish', 'stockfish-17-ubuntu-x86-64'),
-            os.path.join(script_dir, 'stockfish', 'stockfish-17-ubuntu-x86-64-avx2'),
-            os.path.join(script_dir, 'stockfish', 'stockfish-16.1'),
-            os.path.join(script_dir, 'stockfish', 'stockfish-16.1-ubuntu-x86-64'),
-            default_engine_rel,
-            fairy_engine_rel,
-        ]
-        for cand in candidate_names:
-            if cand and os.path.exists(cand):
-                engine_path_to_use = cand
-                break
+        candidate_names = (
+            'stockfish-18',
+            'stockfish-17.1',
+            'stockfish-17',
+            'stockfish-17-ubuntu-x86-64',
+            'stockfish-17-ubuntu-x86-64-avx2',
+            'stockfish-16.1',
+            'stockfish-16.1-ubuntu-x86-64',
+            os.path.basename(default_engine_rel),
+            os.path.basename(fairy_engine_rel),
+        )
+        # List the engine directory once instead of stat-ing every candidate path
+        try:
+            with os.scandir(os.path.join(script_dir, 'stockfish')) as entries:
+                present = {entry.name: entry.path for entry in entries if entry.is_file()}
+        except OSError:
+            present = {}
+        engine_path_to_use = next((present[name] for name in candidate_names if name in present), None)
 
     if engine_path_to_use:
         print(f"Using engine binary at: {engine_path_to_use}")
@@ -136,9 +135,10 @@ def main():
         bot.winddown_hours = 11.5
         bot.max_runtime_hours = 12.0
     
+    threads = min(8, available_cpus() or 4)
     if bot.engine:
         bot.engine.configure({
-            "Threads": min(8, os.cpu_count() or 4),
+            "Threads": threads,
             "Hash": 4096,
             "Move Overhead": 50
         })
@@ -146,7 +146,7 @@ def main():
     print(f"\nManual mode enabled:")
     print(f"  - Time limit: {bot.manual_time_limit * 1000:.0f}ms per move")
     print(f"  - Search depth: {bot.manual_depth}")
-    print(f"  - Threads: {min(8, os.cpu_count() or 4)}")
+    print(f"  - Threads: {threads}")
     print(f"  - Hash: 4096 MB")
     print(f"\nGame constraints:")
     print(f"  - Only one game at a time (bot declines challenges while playing)")
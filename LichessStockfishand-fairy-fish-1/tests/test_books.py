@@ -0,0 +1,49 @@
+"""Tests for the Zobrist-keyed book tables"""
+
+import chess
+import chess.polyglot
+import pytest
+
+import endgame_book
+import middlegame_book
+import opening_book
+from book_utils import pack_moves, unpack_move, zobrist_keyed
+
+def _positions(book, board_cls=chess.Board) -> set:
+    """Distinct Zobrist keys of a FEN book's parseable positions"""
+    keys = set()
+    for fen in book:
+        try:
+            keys.add(chess.polyglot.zobrist_hash(board_cls(fen)))
+        except ValueError:
+            continue
+    return keys
+
+@pytest.mark.parametrize("book, keyed", [
+    (opening_book.OPENING_BOOK, opening_book.OPENING_BOOK_Z),
+    (middlegame_book.MIDDLEGAME_PATTERNS, middlegame_book.MIDDLEGAME_PATTERNS_Z),
+    (endgame_book._RAW_BOOK, endgame_book.ENDGAME_BOOK_Z),
+])
+def test_zobrist_book_has_every_position(book, keyed):
+    assert len(keyed) == len(_positions(book))
+
+def test_colliding_fens_merge_their_moves():
+    book = {
+        chess.STARTING_FEN: ["e2e4", "d2d4"],
+        chess.STARTING_FEN.replace(" 0 1", " 3 7"): ["d2d4", "g1f3"],
+    }
+    keyed = zobrist_keyed(book, value=list)
+    assert keyed == {chess.polyglot.zobrist_hash(chess.Board()): ["e2e4", "d2d4", "g1f3"]}
+
+def test_packed_moves_round_trip():
+    moves = ["e2e4", "e7e8q", "a2a1n", "h7h8r", "b2b1b", "P@e4", "N@f3", "Q@a8"]
+    packed = pack_moves(moves)
+    assert [unpack_move(int.from_bytes(packed[i:i + 2], 'big')) for i in range(0, len(packed), 2)] == moves
+
+def test_malformed_moves_are_skipped():
+    book = {
+        chess.STARTING_FEN: ["e2e4", "e2e9", "zz"],
+        "8/8/8/4k3/8/8/4K3/8 w - - 0 1": ["bad"],
+    }
+    keyed = zobrist_keyed(book)
+    assert keyed == {chess.polyglot.zobrist_hash(chess.Board()): pack_moves(["e2e4"])}
@@ -0,0 +1,58 @@
+"""Tests for the endgame detection and book lookups"""
+
+import chess
+import pytest
+
+import endgame_book
+
+BOARDS = [
+    chess.Board(),
+    chess.Board("8/8/8/4k3/8/8/4K3/8 w - - 0 1"),
+    chess.Board("7q/8/8/4k3/8/8/4K3/Q7 w - - 0 1"),  # h8 occupied: exercises the top bit of the uint64 bitboards
+    chess.Board("r1b1k2r/pp3ppp/2n2n2/8/8/2N2N2/PP3PPP/R1B1K2R w KQkq - 0 1"),  # 8 pieces, no queens
+    chess.Board("r1bqk2r/pp3ppp/2n2n2/8/8/2N2N2/PP3PPP/R1BQK2R w KQkq - 0 1"),  # 10 pieces with queens
+    chess.Board("rn2k2r/pp3ppp/8/8/8/8/PP3PPP/RN2K2R w KQkq - 0 1"),  # 6 pieces
+]
+
+def _piece_count_rule(board) -> bool:
+    """The original is_endgame: at most 6 pieces, or at most 10 with the queens off"""
+    pieces = [p for p in board.piece_map().values() if p.piece_type not in (chess.KING, chess.PAWN)]
+    has_queen = any(p.piece_type == chess.QUEEN for p in board.piece_map().values())
+    return len(pieces) <= 6 or (len(pieces) <= 10 and not has_queen)
+
+def _bitboards(board):
+    return board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK], board.kings, board.pawns, board.queens
+
+@pytest.mark.parametrize("board", BOARDS, ids=lambda b: b.fen())
+def test_is_endgame_matches_piece_count_rule(board):
+    assert bool(endgame_book.is_endgame(board)) == _piece_count_rule(board)
+
+@pytest.mark.parametrize("board", BOARDS, ids=lambda b: b.fen())
+def test_python_predicate_matches_piece_count_rule(board):
+    assert bool(endgame_book._is_endgame_py(*_bitboards(board))) == _piece_count_rule(board)
+
+@pytest.mark.skipif(endgame_book.numba is None, reason="numba not installed")
+@pytest.mark.parametrize("board", BOARDS, ids=lambda b: b.fen())
+def test_numba_predicate_matches_piece_count_rule(board):
+    assert bool(endgame_book._is_endgame_bb(*_bitboards(board))) == _piece_count_rule(board)
+
+@pytest.mark.skipif(endgame_book.numba is None, reason="numba not installed")
+def test_numba_popcount_handles_the_top_bit():
+    assert endgame_book._popcount64(chess.BB_H8) == 1
+    assert endgame_book._popcount64(chess.BB_ALL) == 64
+
+def _bitboard_columns(boards):
+    return [list(column) for column in zip(*(_bitboards(board) for board in boards))]
+
+@pytest.mark.skipif(endgame_book.np is None or not hasattr(endgame_book.np, 'bitwise_count'),
+                    reason="NumPy 2.0+ not installed")
+def test_are_endgame_matches_is_endgame():
+    result = endgame_book.are_endgame(*_bitboard_columns(BOARDS))
+    assert isinstance(result, endgame_book.np.ndarray)
+    assert result.tolist() == [bool(endgame_book.is_endgame(board)) for board in BOARDS]
+
+@pytest.mark.parametrize("numpy", [None, object()], ids=["no-numpy", "numpy-before-2.0"])
+def test_are_endgame_falls_back_without_bitwise_count(monkeypatch, numpy):
+    monkeypatch.setattr(endgame_book, 'np', numpy)
+    result = endgame_book.are_endgame(*_bitboard_columns(BOARDS))
+    assert result == [bool(endgame_book.is_endgame(board)) for board in BOARDS]
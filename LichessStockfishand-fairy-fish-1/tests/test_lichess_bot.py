@@ -0,0 +1,81 @@
+"""Tests for the bot's stream and engine helpers"""
+
+import pytest
+
+import lichess_bot
+
+class _FakeResponse:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_read_ahead_closes_the_stream_response():
+    response = _FakeResponse()
+
+    def events():
+        # What requests does for a stream=True request made on the reader thread
+        lichess_bot._track_stream_response(response, stream=True)
+        while True:
+            yield {'type': 'ping'}
+
+    for event in lichess_bot._read_ahead(events()):
+        break
+    assert response.closed
+
+def test_read_ahead_ignores_non_stream_responses():
+    response = _FakeResponse()
+
+    def events():
+        lichess_bot._track_stream_response(response, stream=False)
+        yield {'type': 'ping'}
+
+    assert list(lichess_bot._read_ahead(events())) == [{'type': 'ping'}]
+    assert not response.closed
+
+def test_available_memory_prefers_meminfo(monkeypatch, tmp_path):
+    meminfo = tmp_path / 'meminfo'
+    meminfo.write_text("MemTotal:       16384000 kB\nMemFree:          512000 kB\nMemAvailable:    8192000 kB\n")
+    real_open = open
+    monkeypatch.setattr('builtins.open', lambda path, *args, **kwargs: real_open(meminfo if path == '/proc/meminfo' else path, *args, **kwargs))
+    assert lichess_bot._available_memory_mb() == 8000
+
+def test_bots_client_exposes_default_fmt():
+    # LichessBot swaps in _OrjsonHandler through this private berserk attribute; fail loudly if an upgrade moves it
+    client = lichess_bot.berserk.Client(session=lichess_bot.berserk.TokenSession('token'))
+    assert isinstance(client.bots._r.default_fmt, lichess_bot.berserk.formats.JsonHandler)
+
+def test_orjson_handler_parses_stream_lines():
+    pytest.importorskip('orjson')
+
+    class _Lines:
+        def iter_lines(self):
+            return iter([b'{"type": "gameStart"}', b'', b'{"type": "gameFinish"}'])
+
+    handler = lichess_bot._OrjsonHandler(mime_type=lichess_bot.berserk.formats.JSON.mime_type)
+    assert list(handler.parse_stream(_Lines())) == [{'type': 'gameStart'}, {'type': 'gameFinish'}]
+
+def test_get_online_bots_asks_the_server_for_limit_plus_one():
+    calls = []
+
+    class _Bots:
+        def get_online_bots(self, limit=None):
+            calls.append(limit)
+            yield from ({'username': name} for name in ['Me', 'A', 'B', 'C'])
+
+    bot = lichess_bot.LichessBot.__new__(lichess_bot.LichessBot)
+    bot.username = 'me'
+    bot.client = type('Client', (), {'bots': _Bots()})()
+    assert bot.get_online_bots(limit=2) == ['A', 'B']
+    assert calls == [3]
+
+@pytest.mark.parametrize("initial", [30, 180, 600])
+def test_time_control_hash_fits_available_memory(monkeypatch, initial):
+    configured = []
+    bot = lichess_bot.LichessBot.__new__(lichess_bot.LichessBot)
+    bot.manual_mode = False
+    bot._tc_engine_config = None
+    bot.engine = type('Engine', (), {'configure': lambda self, config: configured.append(config)})()
+    monkeypatch.setattr(lichess_bot, '_available_memory_mb', lambda: 400)
+    bot._configure_for_time_control(initial)
+    assert configured[0]['Hash'] == 240
@@ -0,0 +1,44 @@
+"""Tests for the variant opening books"""
+
+import pytest
+
+import variant_opening_books
+from book_utils import pack_moves, unpack_move
+
+@pytest.mark.parametrize("variant", sorted(variant_opening_books._BOOK_FACTORIES))
+def test_book_moves_survive_packing(variant):
+    for moves in variant_opening_books._book(variant).values():
+        packed = pack_moves(moves)
+        assert tuple(unpack_move(int.from_bytes(packed[i:i + 2], 'big')) for i in range(0, len(packed), 2)) == moves
+
+@pytest.mark.parametrize("variant", sorted(variant_opening_books._BOOK_FACTORIES))
+def test_book_entries_are_all_valid(variant):
+    book = variant_opening_books._BOOK_FACTORIES[variant]()
+    assert variant_opening_books._validated(variant, book) == book
+
+def test_bad_entries_are_dropped():
+    book = {
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1": ["e2e4", "e2e5", "zz"],
+        "not a fen": ["e2e4"],
+    }
+    assert variant_opening_books._validated('atomic', book) == {
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1": ["e2e4"],
+    }
+
+def test_identical_move_lists_share_one_tuple():
+    start = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+    crazyhouse = variant_opening_books.CRAZYHOUSE_BOOK[start + "[] w KQkq -"]
+    assert crazyhouse is variant_opening_books.KING_OF_THE_HILL_BOOK[start + " w KQkq -"]
+
+def test_intern_tuple_returns_the_pooled_instance():
+    first = variant_opening_books._intern_tuple(tuple(["a1a2", "b1b2"]))
+    assert variant_opening_books._intern_tuple(tuple(["a1a2", "b1b2"])) is first
+    del variant_opening_books._TUPLE_POOL[first]
+
+def test_books_reuse_the_shared_move_tuples():
+    start = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+    assert variant_opening_books.CRAZYHOUSE_BOOK[start + "[] w KQkq -"] is variant_opening_books._E4_D4_NF3
+    assert variant_opening_books.KING_OF_THE_HILL_BOOK[start + " w KQkq -"] is variant_opening_books._E4_D4_NF3
+    atomic = variant_opening_books.ATOMIC_BOOK
+    assert atomic["rnbqkbnr/pppppppp/8/8/8/5N2/PPPPPPPP/RNBQKB1R b KQkq -"] is variant_opening_books._NF6_E6_D5
+    assert atomic["rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3"] is variant_opening_books._NF6_E6_D5
@@ -5,82 +5,213 @@ Contains opening knowledge for Crazyhouse, Chess960, King of the Hill,
 Three-check, Antichess, Atomic, Horde, and Racing Kings
 """
 
+import sys
 import random
+import functools
+import chess
+import chess.variant
+import chess.polyglot
+from book_utils import zobrist_keyed, pick_packed
+
+# Module-private RNG, so book picks can be seeded without touching the global random state
+_RNG = random.Random()
+
+def seed_opening_rng(seed) -> None:
+    """Seed the variant book RNG (for reproducible picks in tests)"""
+    _RNG.seed(seed)
+
+# Move lists shared by several books (one object, so they can't drift apart)
+_E4_D4_NF3 = ("e2e4", "d2d4", "g1f3")
+_NF6_E6_D5 = ("g8f6", "e7e6", "d7d5")
 
 # Crazyhouse Opening Book
-CRAZYHOUSE_BOOK = {
-    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR[] w KQkq - 0 1": ["e2e4", "d2d4", "g1f3"],
-    "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR[] b KQkq e3 0 1": ["e7e5", "c7c5", "g8f6"],
-    "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR[] w KQkq e6 0 2": ["g1f3", "b1c3", "f1c4"],
-}
+def _crazyhouse_book() -> dict:
+    return {
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR[] w KQkq - 0 1": _E4_D4_NF3,
+        "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR[] b KQkq e3 0 1": ["e7e5", "c7c5", "g8f6"],
+        "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR[] w KQkq e6 0 2": ["g1f3", "b1c3", "f1c4"],
+    }
 
 # King of the Hill Opening Book
-KING_OF_THE_HILL_BOOK = {
-    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1": ["e2e4", "d2d4", "g1f3"],
-    "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1": ["e7e5", "d7d5", "g8f6"],
-    "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2": ["g1f3", "d2d4", "b1c3"],
-}
+def _king_of_the_hill_book() -> dict:
+    return {
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1": _E4_D4_NF3,
+        "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1": ["e7e5", "d7d5", "g8f6"],
+        "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2": ["g1f3", "d2d4", "b1c3"],
+    }
 
 # Three-check Opening Book
-THREE_CHECK_BOOK = {
-    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 3+3 0 1": ["e2e4", "g1f3", "d2d4"],
-    "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 3+3 0 1": ["e7e5", "g8f6", "d7d5"],
-    "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 3+3 0 2": ["g1f3", "f1c4", "d2d4"],
-}
+def _three_check_book() -> dict:
+    return {
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 3+3 0 1": ["e2e4", "g1f3", "d2d4"],
+        "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 3+3 0 1": ["e7e5", "g8f6", "d7d5"],
+        "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 3+3 0 2": ["g1f3", "f1c4", "d2d4"],
+    }
 
 # Antichess Opening Book
-ANTICHESS_BOOK = {
-    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1": ["e2e3", "d2d3", "g1f3"],
-    "rnbqkbnr/pppppppp/8/8/8/4P3/PPPP1PPP/RNBQKBNR b - - 0 1": ["b7b6", "g8f6", "e7e6"],
-    "rnbqkbnr/p1pppppp/1p6/8/8/4P3/PPPP1PPP/RNBQKBNR w - - 0 2": ["f1a6", "d1h5", "f1b5"],
-}
+def _antichess_book() -> dict:
+    return {
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1": ["e2e3", "d2d3", "g1f3"],
+        "rnbqkbnr/pppppppp/8/8/8/4P3/PPPP1PPP/RNBQKBNR b - - 0 1": ["b7b6", "g8f6", "e7e6"],
+        "rnbqkbnr/p1pppppp/1p6/8/8/4P3/PPPP1PPP/RNBQKBNR w - - 0 2": ["f1a6", "d1h5", "f1b5"],
+    }
 
 # Atomic Opening Book
-ATOMIC_BOOK = {
-    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1": ["g1f3", "e2e3", "d2d4"],
-    "rnbqkbnr/pppppppp/8/8/8/5N2/PPPPPPPP/RNBQKB1R b KQkq - 1 1": ["g8f6", "e7e6", "d7d5"],
-    "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1": ["g8f6", "e7e6", "d7d5"],
-}
+def _atomic_book() -> dict:
+    return {
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1": ["g1f3", "e2e3", "d2d4"],
+        "rnbqkbnr/pppppppp/8/8/8/5N2/PPPPPPPP/RNBQKB1R b KQkq - 1 1": _NF6_E6_D5,
+        "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1": _NF6_E6_D5,
+    }
 
 # Horde Opening Book
-HORDE_BOOK = {
-    "rnbqkbnr/pppppppp/8/1PP2PP1/PPPPPPPP/PPPPPPPP/PPPPPPPP/PPPPPPPP w kq - 0 1": ["e5e6", "a5a6", "h5h6"],
-    "rnbqkbnr/pppppppp/4P3/1PP2PP1/PPPPPPPP/PPPPPPPP/PPPPPPPP/PPPPPPPP b kq - 0 1": ["d7e6", "f7e6"],
-}
+def _horde_book() -> dict:
+    return {
+        "rnbqkbnr/pppppppp/8/1PP2PP1/PPPPPPPP/PPPPPPPP/PPPPPPPP/PPPPPPPP w kq - 0 1": ["f5f6", "e4e5", "d4d5"],
+        "rnbqkbnr/pppppppp/5P2/1PP3P1/PPPPPPPP/PPPPPPPP/PPPPPPPP/PPPPPPPP b kq - 0 1": ["e7f6", "g7f6"],
+    }
 
 # Racing Kings Opening Book
-RACING_KINGS_BOOK = {
-    "8/8/8/8/8/8/krbnNBRK/qrbnNBRQ w - - 0 1": ["b2c3", "f2e3", "h2g3"],
-    "8/8/8/8/8/2N5/krbn1BRK/qrbnNBRQ b - - 1 1": ["b1c2", "a1b2", "c1d2"],
-}
+def _racing_kings_book() -> dict:
+    return {
+        "8/8/8/8/8/8/krbnNBRK/qrbnNBRQ w - - 0 1": ["h2h3", "h2g3", "e2d4"],
+        "8/8/8/8/8/7K/krbnNBR1/qrbnNBRQ b - - 1 1": ["a2a3", "a2b3", "d2b3"],
+    }
 
 # Chess960 uses standard opening principles
-CHESS960_BOOK = {
-    # Generic Chess960 principles - develop pieces, control center
+def _chess960_book() -> dict:
+    return {
+        # Generic Chess960 principles - develop pieces, control center
+    }
+
+# Lichess variant key -> opening book factory; books are only built when a variant is first played
+_BOOK_FACTORIES = {
+    'crazyhouse': _crazyhouse_book,
+    'kingOfTheHill': _king_of_the_hill_book,
+    'threeCheck': _three_check_book,
+    'antichess': _antichess_book,
+    'atomic': _atomic_book,
+    'horde': _horde_book,
+    'racingKings': _racing_kings_book,
+    'chess960': _chess960_book,
+}
+
+# Public book names, resolved lazily by __getattr__
+_BOOK_NAMES = {
+    'CRAZYHOUSE_BOOK': 'crazyhouse',
+    'KING_OF_THE_HILL_BOOK': 'kingOfTheHill',
+    'THREE_CHECK_BOOK': 'threeCheck',
+    'ANTICHESS_BOOK': 'antichess',
+    'ATOMIC_BOOK': 'atomic',
+    'HORDE_BOOK': 'horde',
+    'RACING_KINGS_BOOK': 'racingKings',
+    'CHESS960_BOOK': 'chess960',
+}
+
+_BOOKS = {}    # variant -> frozen FEN book, filled on first use
+_BOOKS_Z = {}  # variant -> Zobrist-keyed book, filled on first use
+
+def _norm(fen: str) -> str:
+    """Drop the halfmove clock and fullmove number, so transpositions share a key"""
+    return fen.rsplit(' ', 2)[0]
+
+# Move tuple -> its one shared instance, across all books; seeded with the shared lists above
+_TUPLE_POOL = {moves: moves for moves in (_E4_D4_NF3, _NF6_E6_D5)}
+
+def _intern_tuple(moves: tuple) -> tuple:
+    """Return the pooled instance of a move tuple, so equal move lists share one object"""
+    return _TUPLE_POOL.setdefault(moves, moves)
+
+def _freeze(book: dict) -> dict:
+    """Normalize a book's FEN keys and turn its move lists into pooled tuples of interned UCI strings"""
+    frozen = {}
+    for fen, moves in book.items():
+        frozen[_norm(fen)] = _intern_tuple(tuple(sys.intern(move) for move in moves))
+    return frozen
+
+# Lichess variant key -> board class used to parse that book's FENs
+_BOARD_CLASSES = {
+    'crazyhouse': chess.variant.CrazyhouseBoard,
+    'kingOfTheHill': chess.variant.KingOfTheHillBoard,
+    'threeCheck': chess.variant.ThreeCheckBoard,
+    'antichess': chess.variant.AntichessBoard,
+    'atomic': chess.variant.AtomicBoard,
+    'horde': chess.variant.HordeBoard,
+    'racingKings': chess.variant.RacingKingsBoard,
+    'chess960': lambda fen: chess.Board(fen, chess960=True),
 }
 
+def _is_legal(board, uci: str) -> bool:
+    """Check a UCI book move against a board, treating malformed UCI as illegal"""
+    try:
+        return board.is_legal(chess.Move.from_uci(uci))
+    except ValueError:
+        return False
+
+def _validated(variant: str, book: dict) -> dict:
+    """Keep only the FENs that parse and the moves that are legal there, logging what is dropped"""
+    board_cls = _BOARD_CLASSES[variant]
+    valid = {}
+    for fen, moves in book.items():
+        try:
+            board = board_cls(fen)
+        except ValueError:
+            print(f"⚠ Dropping {variant} book position with a bad FEN: {fen}")
+            continue
+        legal = [move for move in moves if _is_legal(board, move)]
+        if len(legal) < len(moves):
+            print(f"⚠ Dropping illegal {variant} book moves {sorted(set(moves) - set(legal))} at {fen}")
+        if legal:
+            valid[fen] = legal if len(legal) < len(moves) else moves
+    return valid
+
+def _book(variant: str) -> dict:
+    """The frozen FEN book for a variant (built and validated on first use), or None for unknown variants"""
+    book = _BOOKS.get(variant)
+    if book is None:
+        factory = _BOOK_FACTORIES.get(variant)
+        if factory is None:
+            return None
+        book = _BOOKS[variant] = _freeze(_validated(variant, factory()))
+    return book
+
+@functools.lru_cache(maxsize=4096)
+def _lookup(variant: str, fen: str) -> tuple:
+    """Candidate moves for a variant position (the pure, cacheable part of the lookup)"""
+    book = _book(variant)
+    return book.get(_norm(fen)) if book else None
+
 def get_variant_opening_move(variant: str, fen: str) -> str:
     """Get a book move for the given variant and position"""
-    if variant == 'crazyhouse':
-        book = CRAZYHOUSE_BOOK
-    elif variant == 'kingOfTheHill':
-        book = KING_OF_THE_HILL_BOOK
-    elif variant == 'threeCheck':
-        book = THREE_CHECK_BOOK
-    elif variant == 'antichess':
-        book = ANTICHESS_BOOK
-    elif variant == 'atomic':
-        book = ATOMIC_BOOK
-    elif variant == 'horde':
-        book = HORDE_BOOK
-    elif variant == 'racingKings':
-        book = RACING_KINGS_BOOK
-    elif variant == 'chess960':
-        book = CHESS960_BOOK
-    else:
+    moves = _lookup(variant, fen)
+    return _RNG.choice(moves) if moves else None
+
+def _zobrist_book(variant: str) -> dict:
+    """The Zobrist-keyed book for a variant (built on first use), or None for unknown variants.
+
+    The hash covers pieces, side to move, castling and en passant; crazyhouse
+    pockets and three-check counters aren't part of it.
+    """
+    book = _BOOKS_Z.get(variant)
+    if book is None:
+        fen_book = _book(variant)
+        if fen_book is None:
+            return None
+        book = _BOOKS_Z[variant] = zobrist_keyed(fen_book, _BOARD_CLASSES[variant])
+    return book
+
+def __getattr__(name: str):
+    """Build the public *_BOOK and VARIANT_BOOKS_Z names on first access"""
+    if name in _BOOK_NAMES:
+        return _book(_BOOK_NAMES[name])
+    if name == 'VARIANT_BOOKS_Z':
+        return {variant: _zobrist_book(variant) for variant in _BOOK_FACTORIES}
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_variant_opening_move_by_key(variant: str, zkey: int) -> str:
+    """Get a book move for the given variant and position Zobrist hash"""
+    book = _zobrist_book(variant)
+    if not book:
         return None
-    
-    if fen in book:
-        moves = book[fen]
-        return random.choice(moves) if isinstance(moves, list) else moves
-    return None
+    moves = book.get(zkey)
+    return pick_packed(moves, _RNG) if moves else None
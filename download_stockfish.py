@@ -6,94 +6,257 @@ Supports Stockfish 18 (preferred) and 17.1 (fallback).
 
 import os
 import sys
+import json
+import hashlib
+import urllib.error
 import urllib.request
 import tarfile
 import shutil
 from pathlib import Path
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import libarchive  # Optional: python-libarchive-c, a C tar reader that extracts faster than tarfile
+except ImportError:
+    libarchive = None
 
 
 RELEASES = {
-    "18": "https://github.com/official-stockfish/Stockfish/releases/download/sf_18/stockfish-ubuntu-x86-64-avx2.tar",
-    "17.1": "https://github.com/official-stockfish/Stockfish/releases/download/sf_17.1/stockfish-ubuntu-x86-64-avx2.tar",
+    "18": "https://github.com/official-stockfish/Stockfish/releases/download/sf_18",
+    "17.1": "https://github.com/official-stockfish/Stockfish/releases/download/sf_17.1",
 }
 
+# GitHub release metadata, which lists a sha256 digest for every asset
+RELEASE_API = "https://api.github.com/repos/official-stockfish/Stockfish/releases/tags/{tag}"
+
+# Linux x86-64 builds, fastest first; avx2 is the safe default every supported runner can execute
+BUILDS = ("vnni512", "avx512", "bmi2", "avx2")
+FALLBACK_BUILD = "avx2"
+
+DOWNLOAD_CHUNK = 1 << 20  # 1 MB
+
+# Release binaries embed the NNUE network, so anything smaller is a truncated download
+MIN_BINARY_SIZE = 20 * 1024 * 1024
+
 STOCKFISH_DIR = Path(__file__).parent / "LichessStockfishand-fairy-fish-1" / "stockfish"
 
 
-def download_stockfish(version):
-    """Download and extract a specific Stockfish version."""
+def pick_build():
+    """Pick the fastest Stockfish build this CPU supports, from /proc/cpuinfo."""
+    try:
+        with open('/proc/cpuinfo') as f:
+            cpuinfo = f.read()
+    except OSError:
+        return FALLBACK_BUILD
+    flags = set(cpuinfo.split())
+    if {'avx512f', 'avx512bw', 'avx512_vnni'} <= flags:
+        return "vnni512"
+    if {'avx512f', 'avx512bw'} <= flags:
+        return "avx512"
+    # pext/pdep are microcoded (slow) on AMD before Zen 3, so only trust bmi2 on Intel
+    if 'bmi2' in flags and 'GenuineIntel' in flags:
+        return "bmi2"
+    return FALLBACK_BUILD
+
+
+def release_url(version, build):
+    """URL of the Linux release tarball for a version and build."""
+    return f"{RELEASES[version]}/{release_asset_name(build)}"
+
+
+def release_asset_name(build):
+    """File name of the Linux release tarball for a build."""
+    return f"stockfish-ubuntu-x86-64-{build}.tar"
+
+
+def published_sha256(version, build):
+    """SHA-256 hex digest GitHub publishes for a release tarball, or None if it can't be fetched."""
+    tag = RELEASES[version].rsplit('/', 1)[1]
+    request = urllib.request.Request(RELEASE_API.format(tag=tag), headers={'Accept': 'application/vnd.github+json'})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            release = json.load(response)
+    except (OSError, ValueError):
+        return None
+    for asset in release.get('assets', []):
+        digest = asset.get('digest') or ''
+        if asset.get('name') == release_asset_name(build) and digest.startswith('sha256:'):
+            return digest[len('sha256:'):]
+    return None
+
+
+def file_sha256(path):
+    """SHA-256 hex digest of a file, read in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fetch(url, dest, progress=False):
+    """Stream url to dest in 1 MB chunks, returning the SHA-256 hex digest of the data.
+    
+    With progress, a single in-place line on stdout shows how much has arrived.
+    
+    The response ETag is kept next to dest; if dest is still current on the server
+    (HTTP 304 for If-None-Match), nothing is downloaded and None is returned.
+    """
+    etag_file = dest.with_suffix('.etag')
+    headers = {}
+    if dest.exists() and etag_file.exists():
+        headers['If-None-Match'] = etag_file.read_text().strip()
+    try:
+        response = urllib.request.urlopen(urllib.request.Request(url, headers=headers))
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None
+        raise
+    
+    # Drop the old ETag first so an interrupted download is never mistaken for a current one
+    etag_file.unlink(missing_ok=True)
+    digest = hashlib.sha256()
+    total_mb = int(response.headers.get('Content-Length') or 0) / (1024*1024)
+    downloaded = 0
+    with response, open(dest, 'wb') as f:
+        for chunk in iter(lambda: response.read(DOWNLOAD_CHUNK), b''):
+            f.write(chunk)
+            digest.update(chunk)
+            if progress:
+                downloaded += len(chunk)
+                sys.stdout.write(f"\r  {downloaded / (1024*1024):.1f} MB / {total_mb:.1f} MB")
+                sys.stdout.flush()
+    if progress:
+        sys.stdout.write("\n")
+    etag = response.headers.get('ETag')
+    if etag:
+        etag_file.write_text(etag)
+    return digest.hexdigest()
+
+
+def extract_member(archive, name, dest):
+    """Copy the member called name out of a tar archive into dest, returning False if it isn't there."""
+    if libarchive is not None:
+        with libarchive.file_reader(str(archive)) as entries:
+            for entry in entries:
+                if entry.pathname == name:
+                    with open(dest, 'wb') as dst:
+                        for block in entry.get_blocks():
+                            dst.write(block)
+                    return True
+        return False
+    with tarfile.open(archive, 'r') as tar:
+        try:
+            member = tar.getmember(name)
+        except KeyError:
+            return False
+        with tar.extractfile(member) as src, open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst, length=DOWNLOAD_CHUNK)
+    return True
+
+
+def is_valid_stockfish(path):
+    """Check that path looks like a complete Stockfish binary (ELF magic and a plausible size)."""
+    try:
+        if path.stat().st_size < MIN_BINARY_SIZE:
+            return False
+        with open(path, 'rb') as f:
+            return f.read(4) == b'\x7fELF'
+    except OSError:
+        return False
+
+
+def download_stockfish(version, log=print, build=None, progress=False):
+    """Download and extract a specific Stockfish version, reporting progress through log.
+    
+    build defaults to the fastest one the CPU supports (see pick_build). With
+    progress, a live download meter is written straight to stdout.
+    """
     if version not in RELEASES:
-        print(f"❌ Unknown version: {version}")
-        print(f"Available versions: {', '.join(RELEASES.keys())}")
+        log(f"❌ Unknown version: {version}")
+        log(f"Available versions: {', '.join(RELEASES.keys())}")
         return False
     
-    print(f"\n{'='*60}")
-    print(f"Downloading Stockfish {version}...")
-    print(f"{'='*60}")
+    log(f"\n{'='*60}")
+    log(f"Downloading Stockfish {version}...")
+    log(f"{'='*60}")
     
-    url = RELEASES[version]
-    tar_file = STOCKFISH_DIR / f"stockfish-{version}.tar"
-    temp_extract_dir = STOCKFISH_DIR / f"temp_extract_{version.replace('.', '_')}"
+    build = build or pick_build()
+    tar_file = STOCKFISH_DIR / f"stockfish-{version}-{build}.tar"
     binary_path = STOCKFISH_DIR / f"stockfish-{version}"
+    tmp_path = binary_path.with_name(binary_path.name + '.tmp')
     
     try:
         # Create directory if needed
         STOCKFISH_DIR.mkdir(parents=True, exist_ok=True)
-        temp_extract_dir.mkdir(exist_ok=True)
         
-        # Check if already exists
-        if binary_path.exists():
-            print(f"✓ Stockfish {version} already exists at {binary_path.name}")
+        # Check if already exists (and isn't left over from an interrupted install)
+        if is_valid_stockfish(binary_path):
+            log(f"✓ Stockfish {version} already exists at {binary_path.name}")
             size_mb = binary_path.stat().st_size / (1024*1024)
-            print(f"  Size: {size_mb:.1f} MB")
+            log(f"  Size: {size_mb:.1f} MB")
             return True
+        if binary_path.exists():
+            log(f"⚠ Existing {binary_path.name} is incomplete or not an ELF binary, reinstalling")
+            binary_path.unlink()
         
         # Download
-        print(f"Downloading from GitHub...")
-        urllib.request.urlretrieve(url, tar_file)
+        log(f"Downloading {build} build from GitHub...")
+        try:
+            sha256 = fetch(release_url(version, build), tar_file, progress)
+        except urllib.error.HTTPError as e:
+            if e.code != 404 or build == FALLBACK_BUILD:
+                raise
+            log(f"⚠ No {build} build published for {version}, using {FALLBACK_BUILD}")
+            build = FALLBACK_BUILD
+            tar_file = STOCKFISH_DIR / f"stockfish-{version}-{build}.tar"
+            sha256 = fetch(release_url(version, build), tar_file, progress)
         size_mb = tar_file.stat().st_size / (1024*1024)
-        print(f"✓ Downloaded ({size_mb:.1f} MB)")
-        
-        # Extract
-        print(f"Extracting...")
-        with tarfile.open(tar_file, 'r') as tar:
-            tar.extractall(temp_extract_dir)
-        print(f"✓ Extracted")
+        if sha256 is None:
+            log(f"✓ Cached tarball is up to date ({size_mb:.1f} MB)")
+            sha256 = file_sha256(tar_file)
+        else:
+            log(f"✓ Downloaded ({size_mb:.1f} MB)")
         
-        # Move binary to correct location
-        extracted_binary = temp_extract_dir / "stockfish" / "stockfish-ubuntu-x86-64-avx2"
-        if extracted_binary.exists():
-            shutil.move(str(extracted_binary), str(binary_path))
-            print(f"✓ Moved to {binary_path.name}")
+        # Verify against the digest GitHub publishes for the asset (a mismatch deletes the tarball below)
+        expected = published_sha256(version, build)
+        if expected is None:
+            log(f"⚠ Could not get the published checksum for {tar_file.name}, installing unverified")
+        elif sha256 != expected:
+            raise ValueError(f"Checksum mismatch for {tar_file.name}: expected {expected}, got {sha256}")
         else:
-            print(f"❌ Binary not found in extraction")
-            return False
+            log(f"✓ Checksum verified (sha256 {sha256})")
         
-        # Make executable
-        os.chmod(binary_path, 0o755)
-        print(f"✓ Made executable")
+        # Extract just the binary, next to its final location
+        log(f"Extracting...")
+        if not extract_member(tar_file, f"stockfish/stockfish-ubuntu-x86-64-{build}", tmp_path):
+            log(f"❌ Binary not found in extraction")
+            tar_file.unlink()
+            return False
         
-        # Cleanup
-        shutil.rmtree(temp_extract_dir)
-        tar_file.unlink()
+        # Make executable, then rename into place (atomic, so a killed install never leaves a partial binary)
+        os.chmod(tmp_path, 0o755)
+        os.replace(tmp_path, binary_path)
+        log(f"✓ Extracted to {binary_path.name}")
+        log(f"✓ Made executable")
         
-        # Verify
+        # Verify (the tarball and its .etag are kept so a reinstall can revalidate instead of re-downloading)
         if binary_path.exists() and os.access(binary_path, os.X_OK):
             size_mb = binary_path.stat().st_size / (1024*1024)
-            print(f"✓ Stockfish {version} ready! ({size_mb:.1f} MB)")
+            log(f"✓ Stockfish {version} ready! ({size_mb:.1f} MB)")
             return True
         else:
-            print(f"❌ Failed to verify binary")
+            log(f"❌ Failed to verify binary")
             return False
             
     except Exception as e:
-        print(f"❌ Error: {e}")
+        log(f"❌ Error: {e}")
         # Cleanup on error
         if tar_file.exists():
             tar_file.unlink()
-        if temp_extract_dir.exists():
-            shutil.rmtree(temp_extract_dir)
+        tar_file.with_suffix('.etag').unlink(missing_ok=True)
+        tmp_path.unlink(missing_ok=True)
         return False
 
 
@@ -110,14 +273,24 @@ def main():
         action="store_true",
         help="Download all available versions"
     )
+    parser.add_argument(
+        "--build",
+        choices=BUILDS,
+        help="CPU build to download. Default: fastest supported by this machine"
+    )
     
     args = parser.parse_args()
     
     if args.all:
         print("Downloading all Stockfish versions...")
-        results = {}
-        for version in sorted(RELEASES.keys(), key=lambda v: float(v)):
-            results[version] = download_stockfish(version)
+        versions = sorted(RELEASES.keys(), key=lambda v: float(v))
+        # Download in parallel; each version logs into its own buffer so the output isn't interleaved
+        logs = {version: [] for version in versions}
+        with ThreadPoolExecutor(max_workers=len(versions)) as pool:
+            futures = {version: pool.submit(download_stockfish, version, logs[version].append, args.build, progress=False) for version in versions}
+            results = {version: future.result() for version, future in futures.items()}
+        for version in versions:
+            print("\n".join(logs[version]))
         
         print(f"\n{'='*60}")
         print("Summary:")
@@ -126,7 +299,7 @@ def main():
             status = "✓" if success else "❌"
             print(f"{status} Stockfish {version}")
     else:
-        success = download_stockfish(args.version)
+        success = download_stockfish(args.version, build=args.build, progress=True)
         sys.exit(0 if success else 1)
     
     # List available binaries